@@ -4,7 +4,8 @@ Airflow DAG for running a Scrapy spider to collect data from Poshmark.
 This DAG is designed to run a Scrapy spider called PoshmarkUSSpider to scrape data from Poshmark.
 The spider can be executed in different environments (prod or non-prod).
 
-The DAG consists of a single task that uses the PythonOperator to run the Scrapy spider.
+The DAG consists of a single task that uses the PythonOperator to run the Scrapy spider
+in-process through Scrapy's CrawlerProcess.
 
 To run this DAG, set the appropriate environment variable 'environment' to 'prod' or leave it empty for non-prod.
 
@@ -18,7 +19,6 @@ Requirements:
 
 import logging
 import os
-import subprocess
 
 from datetime import datetime, timedelta
 
@@ -36,14 +36,17 @@ default_args = {
     "retry_delay": timedelta(minutes=1),
 }
 
+PROD_SCRAPY_ROOT = "/home/muhammad-safdar/projects/hades_scraper/scrapers"
+SCRAPY_ROOT = "scrapers"
+
 
 def run_scrapy_spider():
     """
     Function to execute the Scrapy spider based on the environment variable.
 
-    If the environment is set to 'prod', it changes the working directory
-    and uses a virtual environment for the Scrapy command.
-    Additionally, it logs the current working directory before executing the spider.
+    If the environment is set to 'prod', it runs from the production Scrapy project,
+    otherwise from the local one. The spider runs inside the Airflow worker process
+    so its logs go through the task logger.
 
     Args:
         None
@@ -52,19 +55,21 @@ def run_scrapy_spider():
         None
     """
 
+    # Imported here so parsing this DAG file does not load Scrapy
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
     environment = Variable.get("environment", "")
-    if environment == "prod":
-        os.chdir("/home/muhammad-safdar/projects/hades_scraper/scrapers")
-        scrapy_path = "/home/muhammad-safdar/projects/hades_scraper/scrapers"
-        command = f"{scrapy_path} crawl PoshmarkUSSpider"
-    else:
-        os.chdir("scrapers")
-        command = "scrapy crawl PoshmarkUSSpider"
-
-    current_directory = os.getcwd()
-    logging.info("Current Directory:", current_directory)
-
-    subprocess.run(command, shell=True)
+    scrapy_root = PROD_SCRAPY_ROOT if environment == "prod" else SCRAPY_ROOT
+
+    # The spider writes its exports relative to the Scrapy project root
+    os.chdir(scrapy_root)
+    logging.info("Current Directory: %s", os.getcwd())
+
+    # Leave log handlers and SIGTERM handling to Airflow so task timeouts still fail the task
+    process = CrawlerProcess(get_project_settings(), install_root_handler=False)
+    process.crawl("PoshmarkUSSpider")
+    process.start(install_signal_handlers=False)
 
 
 dag = DAG(
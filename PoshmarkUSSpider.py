@@ -1,16 +1,14 @@
 import csv
+import json
 import os
-import time
+import re
 
 from datetime import datetime
-from scrapy import Selector
-from selenium import webdriver
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
 
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-from scrapy.spiders import CrawlSpider, Request, Spider
+from scrapy import signals
+from scrapy.spiders import Request, Spider
 
 from ...utils import (
     exception_handler,
@@ -18,100 +16,284 @@ from ...utils import (
     get_missing_seller_url,
     insert_region_and_country,
     scraper_url_list,
-    unique_list_of_product,
     update_last_seen,
     update_sellers,
     write_to_excel,
     get_today_date
 )
 
+LD_JSON_CSS = 'script[type="application/ld+json"]::text'
+TITLE_CSS = ".listing__title h1::text"
+DESCRIPTION_CSS = ".listing__description ::text"
+PRICE_CSS = ".listing__ipad-centered p::text"
+IMAGE_CSS = ".carousel__inner img::attr(src)"
+
+PRICE_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
 
 class PoshmarkParser(Spider):
     name = "poshmark-parser"
 
+    # Keys are listed in export column order
+    listing_template = {
+        "seller": "poshmark",
+        "company_id": None,
+        "keyword": None,
+
+        "region": "NA",
+        "country": "United States",
+        "domain": "poshmark.com",
+
+        "currency": "USD",
+        "shipping_address": "",
+        "created_at": None,
+
+        "url": None,
+        "title": "",
+        "description": "",
+        "price": "",
+        "pic": "",
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.today = get_today_date()
+
     @exception_handler
     def parse(self, response, **kwargs):
         """Parse individual product details"""
 
-        parse_product = {
-            "seller": "poshmark",
-            "company_id": kwargs.get("company_id"),
-            "keyword": kwargs.get("keyword"),
+        if response.status in self.spider.taken_down_statuses:
+            self.logger.info("Listing no longer available: %s", response.url)
+            return
+
+        parse_product = self.listing_template.copy()
+        parse_product["company_id"] = kwargs.get("company_id")
+        parse_product["keyword"] = kwargs.get("keyword")
+        parse_product["created_at"] = self.today
+        parse_product["url"] = response.url
+        parse_product.update(self.get_product_details(response))
+
+        self.spider.add_product(parse_product, from_search=not self.is_recheck(response))
+
+    def is_recheck(self, response):
+        """Missing-seller and taken-down requests re-check a known listing"""
+
+        return bool(response.meta.get("missing_seller")) or "advert_id" in response.meta
+
+    def get_product_details(self, response):
+        """Read title, description, price and image from the page's JSON-LD"""
+
+        product_data = self.get_product_ld_json(response)
+        if not product_data:
+            self.logger.debug("No Product JSON-LD, reading HTML instead: %s", response.url)
+            return self.get_product_details_from_html(response)
+
+        offers = product_data.get("offers") or {}
+        if isinstance(offers, list):
+            offers = offers[0] if offers else {}
+        if not isinstance(offers, dict):
+            offers = {}
+
+        # AggregateOffer carries a price range instead of a single price
+        price = offers.get("price")
+        if price is None:
+            price = offers.get("lowPrice")
+
+        image = product_data.get("image") or ""
+        if isinstance(image, list):
+            image = image[0] if image else ""
+        if isinstance(image, dict):
+            image = image.get("url") or image.get("contentUrl") or ""
+        if not isinstance(image, str):
+            image = ""
+
+        return {
+            "title": (product_data.get("name") or "").strip(),
+            "description": (product_data.get("description") or "").strip(),
+            "price": self.normalize_price(price),
+            "pic": image,
+        }
+
+    def get_product_ld_json(self, response):
+        for ld_json in response.css(LD_JSON_CSS).getall():
+            try:
+                data = json.loads(ld_json)
+            except ValueError:
+                continue
+
+            product_data = self.find_ld_json_product(data)
+            if product_data:
+                return product_data
 
-            "region": "NA",
-            "country": "United States", 
-            "domain": "poshmark.com",
+        return {}
 
-            "currency": "USD",
-            "shipping_address": "",
-            "created_at": get_today_date(),
+    def find_ld_json_product(self, data):
+        """Find the Product node in a JSON-LD document, list or @graph"""
 
-            "url": response.url,
-            "title": self.get_title(response),
-            "description": self.get_description(response),
-            "price": self.get_price(response),
-            "pic": self.get_image(response)
-        }
+        if isinstance(data, list):
+            for node in data:
+                product_data = self.find_ld_json_product(node)
+                if product_data:
+                    return product_data
+            return {}
 
-        PoshmarkCrawler.products.append(parse_product)
+        if not isinstance(data, dict):
+            return {}
 
-    def get_product_title(self, response):
-        product_title = response.css(".listing__title h1::text").get()
-        return product_title.strip() if product_title else ""
+        ld_type = data.get("@type")
+        if ld_type == "Product" or (isinstance(ld_type, list) and "Product" in ld_type):
+            return data
 
-    def get_product_description(self, response):
-        product_description = response.css(".listing__description ::text").get()
-        return product_description.strip() if product_description else ""
+        return self.find_ld_json_product(data.get("@graph"))
 
-    def get_product_price(self, response):
-        product_price = response.css(".listing__ipad-centered p::text").get()
-        return product_price.strip() if product_price else ""
+    def get_product_details_from_html(self, response):
+        product_title = response.css(TITLE_CSS).get()
+        product_description = response.css(DESCRIPTION_CSS).get()
+        product_price = response.css(PRICE_CSS).get()
 
-    def get_product_image(self, response):
-        product_image = response.css(".carousel__inner img::attr(src)").get()
-        return product_image or ""
+        return {
+            "title": product_title.strip() if product_title else "",
+            "description": product_description.strip() if product_description else "",
+            "price": self.normalize_price(product_price),
+            "pic": response.css(IMAGE_CSS).get() or "",
+        }
+
+    def normalize_price(self, price):
+        """Format a JSON-LD amount or a displayed price such as $1,250 as 1250.00"""
+
+        if price is None:
+            return ""
+
+        price_match = PRICE_PATTERN.search(str(price))
+        if not price_match:
+            return ""
 
+        try:
+            return f"{Decimal(price_match.group().replace(',', '')):.2f}"
+        except InvalidOperation:
+            return ""
 
-class PoshmarkCrawler(CrawlSpider):
+
+class PoshmarkCrawler(Spider):
     """Crawler for Poshmark website"""
 
     name = "PoshmarkUSSpider"
     allowed_domains = ["poshmark.com"]
     base_url = "https://poshmark.com"
+    api_url = "https://poshmark.com/vm-rest/posts"
 
-    parser = PoshmarkParser()
+    page_size = 48
+    max_products = 500
+    taken_down_statuses = [404, 410]
 
-    products = []
-    taken_down_list = []
-    missing_seller_list = []
+    output_dir = "outputs"
+    csv_batch_size = page_size
 
     custom_settings = {
         "AUTOTHROTTLE_ENABLED": True,
-        "AUTOTHROTTLE_START_DELAY": 4.0,
-        "AUTOTHROTTLE_TARGET_CONCURRENCY": 4.0,
-        "CONCURRENT_REQUESTS": 2,
-        "CONCURRENT_REQUESTS_PER_DOMAIN": 2,
-        "DOWNLOAD_DELAY": 1,
-        "HTTPERROR_ALLOWED_CODES": [code for code in range(100, 1000) if code != 200],
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 16.0,
+        "CONCURRENT_REQUESTS": 64,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 16,
+        "DOWNLOAD_DELAY": 0,
+        "DNSCACHE_ENABLED": True,
+        "DNSCACHE_SIZE": 100000,
+        "DNS_TIMEOUT": 10,
+        "REACTOR_THREADPOOL_MAXSIZE": 40,
+        "SCHEDULER_PRIORITY_QUEUE": "scrapy.pqueues.DownloaderAwarePriorityQueue",
+        "HTTPERROR_ALLOWED_CODES": [],
         "REDIRECT_ENABLED": True,
     }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.driver = self.get_driver()
-        self.driver.implicitly_wait(180)
+        self.parser = PoshmarkParser(spider=self)
+
+        self.seen_urls = set()
+        self.recheck_products = {}
+        self.taken_down_list = []
+        self.missing_seller_list = []
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.csv_filename = os.path.join(self.output_dir, f'poshmark_products_{timestamp}.csv')
+        self._csv_file = None
+        self._csv_writer = None
+        self._csv_batch = []
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
+        return spider
+
+    def spider_opened(self, spider):
+        """Register the crawl region once the crawl actually starts"""
+
         insert_region_and_country("NA", "United States")
 
-    @staticmethod
-    def get_driver():
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox") 
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--incognito")
+    def add_product(self, product, from_search=True):
+        """Store one row per product url, preferring search results over re-checks"""
+
+        url = product["url"]
+        if url in self.seen_urls:
+            return
+
+        # Re-checked listings carry no company or keyword, so they are
+        # held back and only exported if no search result claims the url
+        if not from_search:
+            self.recheck_products.setdefault(url, product)
+            return
+
+        self.seen_urls.add(url)
+        self.recheck_products.pop(url, None)
 
-        return webdriver.Chrome(options=options)
+        self._csv_batch.append(product)
+        if len(self._csv_batch) >= self.csv_batch_size:
+            self._flush_csv()
+
+    def _flush_csv(self):
+        """Append the pending products to the CSV export"""
+
+        if not self._csv_batch:
+            return
+
+        if self._csv_writer is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._csv_file = open(self.csv_filename, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+            self._csv_writer = csv.DictWriter(self._csv_file, fieldnames=self._csv_batch[0].keys())
+            self._csv_writer.writeheader()
+
+        self._csv_writer.writerows(self._csv_batch)
+        self._csv_batch.clear()
+        self._csv_file.flush()
+
+    def _read_csv_products(self):
+        """Load the exported rows back for write_to_excel, which takes a product list"""
+
+        if self._csv_file is None:
+            return []
+
+        with open(self.csv_filename, newline='', encoding='utf-8') as csv_file:
+            return list(csv.DictReader(csv_file))
+
+    def _build_api_url(self, keyword, max_id=1):
+        """Build the search API url backing the listings grid"""
+
+        search_request = {
+            "filters": {"department": "All", "inventory_status": ["available"]},
+            "query_and_facet_filters": {"query": keyword},
+            "experience": "all",
+            "max_id": max_id,
+            "count": self.page_size,
+        }
+        query = urlencode({
+            "request": json.dumps(search_request, separators=(",", ":")),
+            "summarize": "true",
+        })
+
+        return f"{self.api_url}?{query}"
 
     def start_requests(self):
         """Initialize scraping requests"""
@@ -133,11 +315,12 @@ class PoshmarkCrawler(CrawlSpider):
                 continue
             
             yield Request(
-                url=obj.get("url"),
-                callback=self.crawl_poshmark_products,
+                url=self._build_api_url(obj.get("keyword")),
+                callback=self.parse_api,
                 cb_kwargs={
                     "company_id": obj.get("company_id"),
                     "keyword": obj.get("keyword"),
+                    "products_count": 0,
                 },
                 dont_filter=True
             )
@@ -145,72 +328,61 @@ class PoshmarkCrawler(CrawlSpider):
         yield from self._handle_missing_seller_urls()
         yield from self._handle_taken_down_adverts()
 
-    def crawl_poshmark_products(self, response, **kwargs):
-        self.driver.get(response.url)
-        
-        poshmark_products_css = ".grid-page .item__details"
-        poshmark_products_locator = (By.CSS_SELECTOR, poshmark_products_css)
-
-        # Wait for the product elements to load
-        webdriver_wait = WebDriverWait(self.driver, 10)
-        if not webdriver_wait.until(EC.presence_of_element_located(poshmark_products_locator)):
-            self.logger.error("Could not find product elements on page")
-            self.driver.quit()
+    def parse_api(self, response, **kwargs):
+        """Yield product requests from a page of search results"""
+
+        keyword = kwargs.get("keyword")
+        try:
+            data = json.loads(response.text)
+        except ValueError:
+            self.logger.error(
+                "Search API returned non-JSON for keyword: %s (status %s)", keyword, response.status
+            )
             return
 
-        self._scroll_page()
-        
-        # Get the product elements
-        poshmark_products = Selector(text=self.driver.page_source).css(poshmark_products_css)
+        if not isinstance(data, dict):
+            self.logger.error(
+                "Search API returned unexpected JSON for keyword: %s (status %s)", keyword, response.status
+            )
+            return
+
+        products_count = kwargs.get("products_count", 0)
+        poshmark_products = data.get("data") or []
         if not poshmark_products:
-            self.logger.error("No products found after scrolling")
-            self.driver.quit()
+            if products_count == 0:
+                self.logger.error("No products found for keyword: %s", keyword)
             return
 
         # Iterate over the products and yield requests for each product
         for product in poshmark_products:
-            product_url = product.css("a::attr(href)").get()
-            if not product_url:
+            product_id = product.get("id")
+            if not product_id:
                 continue
-                
-            if not product_url.startswith("http"):
-                product_url = self.base_url + product_url
-                
+
             yield Request(
-                url=product_url,
+                url=f"{self.base_url}/listing/{product_id}",
                 callback=self.parser.parse,
                 cb_kwargs={
                     "company_id": kwargs.get("company_id"),
-                    "keyword": kwargs.get("keyword"),
+                    "keyword": keyword,
                 },
-                dont_filter=True
             )
 
-        self.driver.quit()
-
-    def _scroll_page(self):
-        """Handle infinite scrolling"""
-
-        last_height = self.driver.execute_script("return document.body.scrollHeight")            
-        products_count = 0
-        scroll_attempts = 0
-        max_scroll_attempts = 30
-
-        while scroll_attempts < max_scroll_attempts:
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
+        products_count += len(poshmark_products)
+        next_max_id = (data.get("more") or {}).get("next_max_id")
+        if not next_max_id or products_count > self.max_products:
+            return
 
-            new_height = self.driver.execute_script("return document.body.scrollHeight")
-            products = self.driver.find_elements(By.CSS_SELECTOR, ".grid-page .item__details")
-            
-            if (new_height == last_height or 
-                len(products) == products_count or 
-                len(products) > 500):
-                break
-                
-            last_height = new_height
-            products_count = len(products)
-            scroll_attempts += 1
+        yield Request(
+            url=self._build_api_url(keyword, next_max_id),
+            callback=self.parse_api,
+            cb_kwargs={
+                "company_id": kwargs.get("company_id"),
+                "keyword": keyword,
+                "products_count": products_count,
+            },
+            dont_filter=True
+        )
 
     def _handle_missing_seller_urls(self):
         """Process URLs with missing seller info"""
@@ -220,7 +392,8 @@ class PoshmarkCrawler(CrawlSpider):
             yield Request(
                 url=url,
                 callback=self.parser.parse,
-                meta={"missing_seller": True}
+                meta={"missing_seller": True},
+                dont_filter=True
             )
 
     def _handle_taken_down_adverts(self):
@@ -232,27 +405,28 @@ class PoshmarkCrawler(CrawlSpider):
             yield Request(
                 url=url,
                 callback=self.parser.parse,
-                meta={"advert_id": advert_id, "product": product}
+                meta={
+                    "advert_id": advert_id,
+                    "product": product,
+                    "handle_httpstatus_list": self.taken_down_statuses,
+                },
+                dont_filter=True
             )
 
     def closed(self, reason):
         """Handle spider shutdown and data export"""
-        output_dir = 'outputs'
-        os.makedirs(output_dir, exist_ok=True)
 
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        csv_filename = os.path.join(output_dir, f'poshmark_products_{timestamp}.csv')
+        for product in self.recheck_products.values():
+            self.add_product(product)
+        self.recheck_products.clear()
 
-        unique_products = unique_list_of_product(self)
-        if unique_products:
-            with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=unique_products[0].keys())
-                writer.writeheader()
-                writer.writerows(unique_products)
+        self._flush_csv()
+        if self._csv_file:
+            self._csv_file.close()
 
         write_to_excel(
             spider_name=self.name,
-            products=unique_products,
+            products=self._read_csv_products(),
             domain="poshmark.com",
             region="NA",
             country="United States",